@@ -1,7 +1,9 @@
 import requests
 import json
+import numpy as np
 import pandas as pd
 import os
+from collections import namedtuple
 from Bio import Phylo
 import matplotlib.pyplot as plt
 import re
@@ -21,7 +23,7 @@ def iterate_files_in_folder(folder_path):
 #   API CALLS   #
 #################
 
-def pull_diopt_orthologs(input_species_id, output_species_id, entrez_id, output_folder):
+def pull_diopt_orthologs(input_species_id, output_species_id, entrez_id, output_folder=None):
     '''
     Fetches orthologous protein data from the DIOPT API for a given Entrez gene ID and species pair, 
     processes the data into a pandas DataFrame, and saves it as a CSV file.
@@ -30,17 +32,17 @@ def pull_diopt_orthologs(input_species_id, output_species_id, entrez_id, output_
     - input_species_id (str): The species ID for the input species.
     - output_species_id (str): The species ID for the output species.
     - entrez_id (str): The Entrez gene ID for which orthologs are to be fetched.
+    - output_folder (str, optional): The folder to save the CSV file in. If not provided, nothing is written.
 
     Returns:
     - pd.DataFrame: A DataFrame containing the orthologous gene data, with 'entrez_id' and 'symbol' as the first two columns, followed by other data columns.
-    - file_name (str): The name of the CSV file where the DataFrame is saved.
+    - file_name (str): The name of the CSV file where the DataFrame is (or would be) saved.
 
     The function performs the following steps:
     1. Constructs a URL to query the DIOPT API and sends a GET request to retrieve JSON response.
     2. Reorders dataframe for easier reading
-    3. Creates a directory named 'ortholog_output' if it doesn't exist.
-    4. Saves the DataFrame to a CSV file named after the gene symbol.
-    5. Prints a success message if orthologs are found, or an error message if not.
+    3. Saves the DataFrame to a CSV file named after the gene symbol, if output_folder is provided.
+    4. Prints a success message if orthologs are found, or an error message if not.
 
     Note:
     - The function suppresses SSL verification warnings when making the API request.
@@ -67,7 +69,8 @@ def pull_diopt_orthologs(input_species_id, output_species_id, entrez_id, output_
 
     file_name = f"{gene_name}_fly_orthologs.csv"
 
-    df.to_csv(f"{output_folder}/{file_name}", index=False)
+    if output_folder:
+        df.to_csv(f"{output_folder}/{file_name}", index=False)
 
     print("Found DIOPT orthologs")
 
@@ -77,31 +80,69 @@ def pull_diopt_orthologs(input_species_id, output_species_id, entrez_id, output_
 #   ORTHOLOG AND ALIGNMENT  #
 #############################
         
-def filter_diopt_results(df, file_name, output_folder):
+def filter_diopt_results(df, file_name=None, output_folder=None):
     '''
     Filters a DataFrame to include rows that are likely the best ortholog for a given protein/gene
 
     Parameters:
     - df (pd.DataFrame): The input DataFrame, typically the output from the `pull_diopt_orthologs` function,
       containing orthologous gene data with columns such as 'best_score', 'best_score_rev', and 'confidence'.
+    - file_name (str, optional): The name of the unfiltered CSV file, used to name the filtered one.
+    - output_folder (str, optional): The folder to save the filtered CSV file in. If not provided, nothing is written.
 
     Returns:
     - pd.DataFrame: A new DataFrame containing only the rows from the input DataFrame where:
       - 'best_score' is "Yes", or
       - 'best_score_rev' is "Yes", or
       - 'confidence' is either "high" or "moderate".
-
-    The function iterates over each row of the input DataFrame and checks the specified conditions.
-    If a row meets any of these conditions, it is added to the output DataFrame.
+    - output_file (str or None): The name of the filtered CSV file, if file_name was provided.
     '''
-    output_df = pd.DataFrame()
-    for _, row in df.iterrows():
-        if row["best_score"] == "Yes" or row["best_score_rev"] == "Yes" or row["confidence"] in ["high", "moderate"]:
-            output_df = pd.concat([output_df, pd.DataFrame([row])], ignore_index=True)
-    output_file = f"filtered_{file_name}"
-    output_df.to_csv(f"{output_folder}/{output_file}", index = False)
+    mask = (df["best_score"] == "Yes") | (df["best_score_rev"] == "Yes") | df["confidence"].isin(["high", "moderate"])
+    output_df = df[mask].reset_index(drop=True)
+    output_file = f"filtered_{file_name}" if file_name else None
+    if output_folder and output_file:
+        output_df.to_csv(f"{output_folder}/{output_file}", index = False)
     return output_df, output_file
 
+def run_ortholog_pipeline(input_species_id, output_species_id, entrez_id, input_protein_file, output_folder=None):
+    '''
+    Runs the ortholog steps of oracle.ipynb in one process, passing results between stages in memory.
+
+    Parameters:
+    - input_species_id (str): The species ID for the input species.
+    - output_species_id (str): The species ID for the output species.
+    - entrez_id (str): The Entrez gene ID for which orthologs are to be fetched.
+    - input_protein_file (str): The FASTA file of the input protein isoform.
+    - output_folder (str, optional): The checkpoint folder. If provided, the ortholog CSVs,
+      protein_orthologs.zip and combined_proteins.fasta are saved there as before.
+
+    Returns:
+    - pd.DataFrame: The filtered DIOPT orthologs.
+    - str: The input protein followed by the ortholog proteins, in FASTA format, ready for alignment.
+
+    The ortholog IDs are handed to the NCBI Datasets API directly rather than through a
+    get_protein_info.py command line, so there is no limit on how many can be passed.
+    Raises ValueError if no ortholog passes `filter_diopt_results`.
+    '''
+    from oracle_scripts.get_protein_info import fetch_protein_fasta
+
+    diopt_results, diopt_file = pull_diopt_orthologs(input_species_id, output_species_id, entrez_id, output_folder)
+    filtered_diopt_results, _ = filter_diopt_results(diopt_results, diopt_file, output_folder)
+    if filtered_diopt_results.empty:
+        raise ValueError(f"No DIOPT ortholog of {entrez_id} passed the filter, nothing to align")
+
+    zipfile_name = f"{output_folder}/protein_orthologs.zip" if output_folder else None
+    ortholog_fasta = fetch_protein_fasta(filtered_diopt_results["entrez_id"].to_list(), zipfile_name)
+
+    with open(input_protein_file, 'r') as f:
+        combined_fasta = f.read() + "\n" + ortholog_fasta
+
+    if output_folder:
+        with open(f"{output_folder}/combined_proteins.fasta", 'w') as f:
+            f.write(combined_fasta)
+
+    return filtered_diopt_results, combined_fasta
+
 #################
 #   EVOLUTION  #
 ################
@@ -141,6 +182,202 @@ def visualize_phylogenetic_tree(file_path, file_format='newick', output_file=Non
         # Show the plot if no output file is specified
         plt.show()
 
+# Compact tree: nodes in preorder, so parent[i] < i for every node but the root (parent -1)
+ArrayTree = namedtuple("ArrayTree", ["names", "parent", "branch_length"])
+
+NEWICK_TOKENS = re.compile(r"\s*(?:([(),;])|:\s*([-+0-9.eE]+)|('[^']*'|[^\s(),:;']+))")
+
+def parse_newick(newick):
+    '''
+    Parses a Newick string, such as a ClustalW .dnd guide tree, into an ArrayTree.
+
+    Parameters:
+    - newick (str): The tree in Newick format.
+
+    Returns:
+    - ArrayTree: A named tuple of
+      - names (np.ndarray of str): Node labels, '' for unlabeled internal nodes.
+      - parent (np.ndarray of int): Index of each node's parent, -1 for the root.
+      - branch_length (np.ndarray of float): Length of the branch above each node, 0 if missing.
+
+    Nodes are numbered in preorder, so every parent comes before its children.
+    Labels containing whitespace or punctuation must be single-quoted, e.g. 'Homo sapiens'.
+    '''
+    names, parent, branch_length = [""], [-1], [0.0]
+    stack = []
+    current = 0
+    for punctuation, length, label in NEWICK_TOKENS.findall(newick):
+        if punctuation == "(":
+            stack.append(current)
+            names.append("")
+            parent.append(current)
+            branch_length.append(0.0)
+            current = len(names) - 1
+        elif punctuation == ",":
+            if not stack:
+                raise ValueError("Unbalanced parentheses in Newick tree")
+            names.append("")
+            parent.append(stack[-1])
+            branch_length.append(0.0)
+            current = len(names) - 1
+        elif punctuation == ")":
+            if not stack:
+                raise ValueError("Unbalanced parentheses in Newick tree")
+            current = stack.pop()
+        elif punctuation == ";":
+            break
+        elif length:
+            branch_length[current] = float(length)
+        elif label:
+            names[current] = label[1:-1] if label.startswith("'") else label
+    if stack:
+        raise ValueError("Unbalanced parentheses in Newick tree")
+    return ArrayTree(np.array(names), np.array(parent), np.array(branch_length))
+
+def read_newick_trees(file_paths):
+    '''
+    Reads a list of Newick files (e.g., one msa_test.dnd per gene) into a list of ArrayTrees.
+    '''
+    trees = []
+    for file_path in file_paths:
+        with open(file_path, 'r') as f:
+            trees.append(parse_newick(f.read()))
+    return trees
+
+def leaf_indices(tree):
+    '''
+    Returns the indices of the nodes that are nobody's parent.
+    '''
+    is_leaf = np.ones(len(tree.parent), dtype=bool)
+    is_leaf[tree.parent[tree.parent >= 0]] = False
+    return np.flatnonzero(is_leaf)
+
+def ancestor_matrix(tree, nodes):
+    '''
+    Returns a boolean matrix whose row k marks every ancestor of nodes[k], itself included.
+    '''
+    ancestors = np.zeros((len(nodes), len(tree.parent)), dtype=bool)
+    rows = np.arange(len(nodes))
+    current = np.asarray(nodes)
+    while len(current):
+        ancestors[rows, current] = True
+        current = tree.parent[current]
+        rows, current = rows[current >= 0], current[current >= 0]
+    return ancestors
+
+def patristic_distances(tree):
+    '''
+    Computes the patristic (path length) distance between every pair of leaves.
+
+    Parameters:
+    - tree (ArrayTree): The tree, as returned by `parse_newick`.
+
+    Returns:
+    - np.ndarray of str: The leaf names.
+    - np.ndarray of float: A square matrix of pairwise distances, in the same order as the names.
+
+    The distance between two leaves is depth(a) + depth(b) - 2 * depth(lca), where the depth of
+    the lowest common ancestor is the summed branch length of all shared ancestors. That is one
+    matrix product over the leaves x nodes ancestor matrix, so memory stays at leaves x nodes.
+    '''
+    leaves = leaf_indices(tree)
+    ancestors = ancestor_matrix(tree, leaves)
+    branch_length = tree.branch_length.astype(float)
+    branch_length[0] = 0.0
+    path_lengths = ancestors * branch_length
+    depth = path_lengths.sum(axis=1)
+    shared_depth = path_lengths @ ancestors.T.astype(float)
+    distances = depth[:, None] + depth[None, :] - 2 * shared_depth
+    return tree.names[leaves], distances
+
+def rank_orthologs_by_distance(tree, query):
+    '''
+    Ranks every other leaf of a tree by its patristic distance to the query protein.
+
+    Parameters:
+    - tree (ArrayTree): The tree, as returned by `parse_newick`.
+    - query (str): The leaf name of the human query protein, i.e. the first word of the
+      FASTA header in input_protein_file (e.g., 'NP_001269154.1' for ADA2).
+
+    Returns:
+    - pd.DataFrame: Columns 'ortholog' and 'distance', nearest first.
+    '''
+    names, distances = patristic_distances(tree)
+    matches = np.flatnonzero(names == query)
+    if len(matches) == 0:
+        raise ValueError(f"Query {query} is not a leaf of the tree")
+    query_distances = distances[matches[0]]
+    others = np.flatnonzero(names != query)
+    order = others[np.argsort(query_distances[others], kind="stable")]
+    return pd.DataFrame({"ortholog": names[order], "distance": query_distances[order]})
+
+def rank_orthologs_for_panel(tree_files, queries):
+    '''
+    Ranks orthologs by evolutionary distance to the query protein for a whole panel of genes.
+
+    Parameters:
+    - tree_files (dict): Maps each gene symbol to its Newick file (e.g., msa_test.dnd).
+    - queries (dict): Maps each gene symbol to the leaf name of its human query protein.
+
+    Returns:
+    - pd.DataFrame: Columns 'gene', 'ortholog', 'distance' and 'rank' (1 is the nearest ortholog).
+    '''
+    genes = list(tree_files)
+    trees = read_newick_trees([tree_files[gene] for gene in genes])
+    ranked = []
+    for gene, tree in zip(genes, trees):
+        df = rank_orthologs_by_distance(tree, queries[gene])
+        df.insert(0, "gene", gene)
+        df["rank"] = np.arange(1, len(df) + 1)
+        ranked.append(df)
+    return pd.concat(ranked, ignore_index=True)
+
+def collapse_zero_length_duplicates(tree, tolerance=0.0):
+    '''
+    Collapses leaves that sit at zero distance from each other, such as identical isoforms
+    of one fly gene, down to the first of them.
+
+    Leaves are visited in tree order and a leaf is only dropped if it is within tolerance of a
+    leaf that is kept, so every remaining leaf is more than tolerance away from the others.
+
+    Parameters:
+    - tree (ArrayTree): The tree, as returned by `parse_newick`.
+    - tolerance (float, optional): The largest distance still treated as a duplicate. Defaults to 0.
+
+    Returns:
+    - ArrayTree: The pruned tree. Internal nodes left with a single child are removed and their
+      branch length is added to that child, so the remaining distances are unchanged.
+    - dict: Maps each kept leaf name to the list of leaf names collapsed into it.
+    '''
+    leaves = leaf_indices(tree)
+    names, distances = patristic_distances(tree)
+    dropped = np.zeros(len(leaves), dtype=bool)
+    collapsed = {}
+    for j in range(1, len(leaves)):
+        near_kept = np.flatnonzero((distances[:j, j] <= tolerance) & ~dropped[:j])
+        if len(near_kept):
+            dropped[j] = True
+            collapsed.setdefault(str(names[near_kept[0]]), []).append(str(names[j]))
+
+    kept_nodes = ancestor_matrix(tree, leaves[~dropped]).any(axis=0)
+    kept_children = np.bincount(tree.parent[kept_nodes & (tree.parent >= 0)], minlength=len(tree.parent))
+    skipped = kept_nodes & (kept_children == 1)
+
+    new_index = {}
+    names_out, parent_out, branch_length_out = [], [], []
+    for i in np.flatnonzero(kept_nodes & ~skipped):
+        length = tree.branch_length[i]
+        p = tree.parent[i]
+        while p >= 0 and skipped[p]:
+            length += tree.branch_length[p]
+            p = tree.parent[p]
+        new_index[i] = len(names_out)
+        names_out.append(tree.names[i])
+        parent_out.append(new_index[p] if p >= 0 else -1)
+        branch_length_out.append(length if p >= 0 else 0.0)
+    pruned = ArrayTree(np.array(names_out), np.array(parent_out), np.array(branch_length_out))
+    return pruned, collapsed
+
 ########################
 #   MUTATION EFFECTS   #
 ########################
@@ -0,0 +1,367 @@
+"""
+Serve precomputed per-gene ortholog/variant reports over HTTP.
+
+The `build` command packs the outputs written by oracle.ipynb for one gene
+(filtered DIOPT orthologs, mapped alleles, UniProt sites, GO terms and the
+phylogenetic tree image) into a SQLite database. The `serve` command answers
+lookups by gene symbol, Entrez ID or UniProt ID straight from that database,
+so no upstream API is called and nothing is recomputed per request.
+
+Example commands:
+python oracle_scripts/serve_reports.py build reports.db ADA2 51816 Q9NZK5
+python oracle_scripts/serve_reports.py serve reports.db --port 8000
+
+Endpoints:
+GET /genes/{symbol|entrez|uniprot}/<id>           JSON report
+GET /genes/{symbol|entrez|uniprot}/<id>/tree.png  phylogenetic tree image
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import gzip
+import sqlite3
+import hashlib
+import argparse
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# URL lookup kind -> indexed column
+LOOKUP_COLUMNS = {
+    "symbol": "symbol",
+    "entrez": "entrez_id",
+    "uniprot": "uniprot_id",
+}
+
+# Colors written by oracle_functions.generate_pymol_script_domains
+SITE_TYPES = {"yellow": "Active site", "blue": "Binding site"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    symbol TEXT PRIMARY KEY COLLATE NOCASE,
+    entrez_id TEXT,
+    uniprot_id TEXT COLLATE NOCASE,
+    report_gz BLOB NOT NULL,
+    report_etag TEXT NOT NULL,
+    tree_png BLOB,
+    tree_etag TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_reports_entrez_id ON reports (entrez_id);
+CREATE INDEX IF NOT EXISTS idx_reports_uniprot_id ON reports (uniprot_id);
+"""
+
+#####################
+#   BUILD REPORTS   #
+#####################
+
+def read_csv_records(file_path):
+    '''
+    Reads a CSV file into a list of dicts, or an empty list if the file does not exist.
+    '''
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path, newline='') as f:
+        return list(csv.DictReader(f))
+
+def read_uniprot_sites(file_path):
+    '''
+    Parses a script from oracle_functions.generate_pymol_script_domains back into
+    a list of {"type", "start", "end", "color"} dicts.
+
+    Raises ValueError if the script does not look like one that function writes,
+    rather than silently returning fewer sites.
+    '''
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path) as f:
+        script = f.read()
+    ranges = dict(re.findall(r"cmd\.select\('(site_\d+)', 'resi (\d+-\d+)'\)", script))
+    colors = re.findall(r"cmd\.color\('([^']*)', '(site_\d+)'\)", script)
+    if len(ranges) != script.count("cmd.select(") or len(colors) != script.count("cmd.color("):
+        raise ValueError(f"Unrecognized PyMOL script format in {file_path}")
+    sites = []
+    for color, name in colors:
+        if name not in ranges:
+            raise ValueError(f"Site {name} is colored but never selected in {file_path}")
+        start, end = ranges[name].split('-')
+        sites.append({"type": SITE_TYPES.get(color), "start": int(start), "end": int(end), "color": color})
+    return sites
+
+def read_go_terms(file_path):
+    '''
+    Reads a {gene}_related_GO_terms.csv file into a list of {"term", "category"} dicts.
+    '''
+    return [
+        {"term": row["second_element"], "category": row["mapped_value"]}
+        for row in read_csv_records(file_path)
+    ]
+
+def build_report(gene_symbol, entrez_id, uniprot_id, base_dir="."):
+    '''
+    Collects the notebook outputs for one gene into a single report dict.
+
+    Parameters:
+    - gene_symbol (str): The human gene symbol, as used for input_gene_id in oracle.ipynb.
+    - entrez_id (str): The Entrez gene ID of the human gene.
+    - uniprot_id (str): The UniProt accession of the human protein.
+    - base_dir (str, optional): The folder oracle.ipynb was run from. Defaults to '.'.
+
+    Returns:
+    - dict: The report, JSON serializable.
+    - bytes or None: The phylogenetic tree PNG, if one was generated.
+
+    The alleles come from the {gene}_mapped_alleles.csv checkpoint that oracle.ipynb saves
+    alongside the allele PyMOL script, so each position keeps its protein change and significance.
+
+    Raises FileNotFoundError if the gene's output folder or filtered ortholog CSV is missing,
+    which usually means the symbol does not match the one the notebook was run with.
+    The other outputs are optional and left empty when absent.
+    '''
+    output_folder = os.path.join(base_dir, f"{gene_symbol}_ortholog_and_alignments_output")
+    orthologs_file = os.path.join(output_folder, f"filtered_{gene_symbol}_fly_orthologs.csv")
+    if not os.path.isdir(output_folder):
+        raise FileNotFoundError(f"Output folder {output_folder} not found")
+    if not os.path.exists(orthologs_file):
+        raise FileNotFoundError(f"Filtered orthologs {orthologs_file} not found")
+
+    report = {
+        "symbol": gene_symbol,
+        "entrez_id": str(entrez_id),
+        "uniprot_id": uniprot_id,
+        "orthologs": read_csv_records(orthologs_file),
+        "alleles": read_csv_records(os.path.join(base_dir, f"{gene_symbol}_mapped_alleles.csv")),
+        "uniprot_sites": read_uniprot_sites(os.path.join(base_dir, f"{gene_symbol}_color_domains.pml")),
+        "go_terms": read_go_terms(os.path.join(base_dir, f"{gene_symbol}_related_GO_terms.csv")),
+    }
+    tree_png = None
+    tree_file = os.path.join(output_folder, "phylo_tree.png")
+    if os.path.exists(tree_file):
+        with open(tree_file, 'rb') as f:
+            tree_png = f.read()
+    return report, tree_png
+
+def make_etag(payload, weak=False):
+    '''
+    Returns an ETag for the payload. Weak ETags are used where the same content
+    is sent with more than one Content-Encoding.
+    '''
+    etag = '"' + hashlib.sha256(payload).hexdigest()[:32] + '"'
+    return "W/" + etag if weak else etag
+
+def store_report(db_path, report, tree_png=None):
+    '''
+    Inserts or replaces a gene report in the results database.
+
+    The report is stored gzipped together with its ETag so the server never
+    has to serialize, compress or hash anything at request time.
+
+    Symbols are matched case-insensitively, so a report is only replaced by one
+    with the exact same symbol; anything else raises ValueError.
+    '''
+    report_json = json.dumps(report, separators=(',', ':')).encode("utf8")
+    # mtime=0 keeps the compressed bytes, and so the ETag, stable across rebuilds
+    report_gz = gzip.compress(report_json, mtime=0)
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.executescript(SCHEMA)
+            existing = conn.execute("SELECT symbol FROM reports WHERE symbol = ?", (report["symbol"],)).fetchone()
+            if existing and existing[0] != report["symbol"]:
+                raise ValueError(f"Database already has a report for {existing[0]}, refusing to replace it with {report['symbol']}")
+            conn.execute(
+                "INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    report["symbol"],
+                    report["entrez_id"],
+                    report["uniprot_id"],
+                    report_gz,
+                    # The JSON is served both gzipped and not, so its ETag is weak
+                    make_etag(report_json, weak=True),
+                    tree_png,
+                    make_etag(tree_png) if tree_png else None,
+                ),
+            )
+    finally:
+        conn.close()
+
+#####################
+#   SERVE REPORTS   #
+#####################
+
+class ReportStore:
+    '''
+    Read-only access to the results database with an in-process LRU of hot genes.
+
+    ThreadingHTTPServer starts a thread per request, so one read-only connection
+    is shared by all of them behind a lock. Only found genes are cached, and the
+    cache is cleared whenever another connection writes to the database, so genes
+    built or rebuilt while the server is running are served fresh.
+    '''
+
+    def __init__(self, db_path, cache_size=256):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Results database {db_path} not found")
+        self.db_path = db_path
+        uri = "file:" + os.path.abspath(db_path) + "?mode=ro"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._cached_lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def lookup(self, kind, gene_id):
+        '''
+        Returns (report_gz, report_etag, tree_png, tree_etag) for a gene, or None if it is unknown.
+        '''
+        with self._lock:
+            # data_version changes when any other connection commits, e.g. a `build`
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._cached_lookup.cache_clear()
+                self._data_version = data_version
+            try:
+                return self._cached_lookup(kind, gene_id)
+            except KeyError:
+                return None
+
+    def _lookup(self, kind, gene_id):
+        # Misses raise rather than return None, because lru_cache does not cache exceptions
+        column = LOOKUP_COLUMNS[kind]
+        row = self._conn.execute(
+            f"SELECT report_gz, report_etag, tree_png, tree_etag FROM reports WHERE {column} = ? LIMIT 1",
+            (gene_id,),
+        ).fetchone()
+        if row is None:
+            raise KeyError(gene_id)
+        return row
+
+def etag_matches(if_none_match, etag):
+    '''
+    Checks an If-None-Match header against an ETag, using weak comparison as RFC 9110 requires.
+    '''
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque_tag:
+            return True
+    return False
+
+def accepts_gzip(accept_encoding):
+    '''
+    Checks whether an Accept-Encoding header allows gzip, honouring q=0 and the * wildcard.
+    '''
+    wildcard_q = None
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name in ("gzip", "x-gzip"):
+            return q > 0
+        if name == "*":
+            wildcard_q = q
+    return wildcard_q is not None and wildcard_q > 0
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    store = None
+    head_only = False
+
+    def do_GET(self):
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        if len(parts) not in (3, 4) or parts[0] != "genes" or parts[1] not in LOOKUP_COLUMNS:
+            return self.send_error(404, "Use /genes/{symbol|entrez|uniprot}/<id>[/tree.png]")
+        if len(parts) == 4 and parts[3] != "tree.png":
+            return self.send_error(404)
+
+        row = self.store.lookup(parts[1], parts[2])
+        if row is None:
+            return self.send_error(404, f"No report for {parts[1]} {parts[2]}")
+        report_gz, report_etag, tree_png, tree_etag = row
+
+        if len(parts) == 4:
+            if tree_png is None:
+                return self.send_error(404, f"No tree image for {parts[1]} {parts[2]}")
+            # PNG is already compressed, so it is never gzipped again
+            return self.send_body(tree_png, tree_etag, "image/png")
+        return self.send_body(report_gz, report_etag, "application/json", gzipped=True)
+
+    def do_HEAD(self):
+        self.head_only = True
+        self.do_GET()
+
+    def send_body(self, body, etag, content_type, gzipped=False):
+        if etag_matches(self.headers.get("If-None-Match", ""), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        if gzipped:
+            self.send_header("Vary", "Accept-Encoding")
+            if accepts_gzip(self.headers.get("Accept-Encoding", "")):
+                self.send_header("Content-Encoding", "gzip")
+            else:
+                body = gzip.decompress(body)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not self.head_only:
+            self.wfile.write(body)
+
+def serve_reports(db_path, host="127.0.0.1", port=8000, cache_size=256):
+    '''
+    Serves reports from the results database until interrupted.
+    '''
+    handler = type("Handler", (ReportRequestHandler,), {"store": ReportStore(db_path, cache_size)})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Serving reports from {db_path} on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and serve precomputed per-gene reports.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Add a gene's notebook outputs to the results database")
+    build_parser.add_argument('db_path', type=str, help='The results database file')
+    build_parser.add_argument('gene_symbol', type=str, help='The gene symbol (e.g., ADA2)')
+    build_parser.add_argument('entrez_id', type=str, help='The Entrez ID (e.g., 51816 for ADA2)')
+    build_parser.add_argument('uniprot_id', type=str, help='The UniProt ID (e.g., Q9NZK5 for ADA2)')
+    build_parser.add_argument('--base_dir', type=str, default='.', help='The folder oracle.ipynb was run from')
+
+    serve_parser = subparsers.add_parser("serve", help="Serve reports from the results database")
+    serve_parser.add_argument('db_path', type=str, help='The results database file')
+    serve_parser.add_argument('--host', type=str, default='127.0.0.1', help='The address to listen on')
+    serve_parser.add_argument('--port', type=int, default=8000, help='The port to listen on')
+    serve_parser.add_argument('--cache_size', type=int, default=256, help='Number of lookups kept in memory')
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        try:
+            report, tree_png = build_report(args.gene_symbol, args.entrez_id, args.uniprot_id, args.base_dir)
+            store_report(args.db_path, report, tree_png)
+        except (FileNotFoundError, ValueError) as e:
+            sys.exit(str(e))
+        print(f"Stored report for {args.gene_symbol} in {args.db_path}")
+    else:
+        serve_reports(args.db_path, args.host, args.port, args.cache_size)
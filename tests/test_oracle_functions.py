@@ -0,0 +1,159 @@
+import os
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+from Bio import Phylo
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+sys.path.append(BASE_DIR)
+import oracle_functions
+
+ADA2_OUTPUT = os.path.join(BASE_DIR, "ADA2_ortholog_and_alignments_output")
+ADA2_TREE = os.path.join(ADA2_OUTPUT, "msa_test.dnd")
+ADA2_QUERY = "NP_001269154.1"
+
+#############################
+#   ORTHOLOG AND ALIGNMENT  #
+#############################
+
+def test_filter_diopt_results_matches_checked_in_output():
+    df = pd.read_csv(os.path.join(ADA2_OUTPUT, "ADA2_fly_orthologs.csv"))
+    filtered, output_file = oracle_functions.filter_diopt_results(df, "ADA2_fly_orthologs.csv")
+
+    expected = pd.read_csv(os.path.join(ADA2_OUTPUT, "filtered_ADA2_fly_orthologs.csv"))
+    pd.testing.assert_frame_equal(filtered, expected)
+    assert output_file == "filtered_ADA2_fly_orthologs.csv"
+
+DIOPT_RESULTS = pd.DataFrame({
+    "entrez_id": [39975, 39976, 12345],
+    "symbol": ["Adgf-B", "Adgf-A", "CG0000"],
+    "best_score": ["Yes", "No", "No"],
+    "best_score_rev": ["No", "Yes", "No"],
+    "confidence": ["high", "low", "low"],
+})
+ORTHOLOG_FASTA = ">NP_1 Adgf-B\nMKV\n>NP_2 Adgf-A\nMKL\n"
+
+@pytest.fixture
+def fake_upstream(monkeypatch, tmp_path):
+    '''
+    Replaces the DIOPT and NCBI Datasets calls made by run_ortholog_pipeline.
+    '''
+    fetched = []
+
+    def pull_diopt_orthologs(input_species_id, output_species_id, entrez_id, output_folder=None):
+        if output_folder:
+            DIOPT_RESULTS.to_csv(f"{output_folder}/ADA2_fly_orthologs.csv", index=False)
+        return DIOPT_RESULTS.copy(), "ADA2_fly_orthologs.csv"
+
+    def fetch_protein_fasta(gene_ids, zipfile_name=None):
+        fetched.append(list(gene_ids))
+        if zipfile_name:
+            with open(zipfile_name, "wb") as f:
+                f.write(b"zip")
+        return ORTHOLOG_FASTA
+
+    get_protein_info = types.ModuleType("oracle_scripts.get_protein_info")
+    get_protein_info.fetch_protein_fasta = fetch_protein_fasta
+    monkeypatch.setitem(sys.modules, "oracle_scripts.get_protein_info", get_protein_info)
+    monkeypatch.setattr(oracle_functions, "pull_diopt_orthologs", pull_diopt_orthologs)
+
+    input_protein_file = tmp_path / "ADA2.txt"
+    input_protein_file.write_text(">NP_001269154.1 ADA2\nMLVDG")
+    return str(input_protein_file), fetched
+
+def test_run_ortholog_pipeline_writes_checkpoints(fake_upstream, tmp_path):
+    input_protein_file, fetched = fake_upstream
+    output_folder = tmp_path / "ADA2_ortholog_and_alignments_output"
+    output_folder.mkdir()
+
+    filtered, combined_fasta = oracle_functions.run_ortholog_pipeline(9606, 7227, 51816, input_protein_file, str(output_folder))
+
+    assert filtered["symbol"].to_list() == ["Adgf-B", "Adgf-A"]
+    assert fetched == [[39975, 39976]]
+    assert combined_fasta == ">NP_001269154.1 ADA2\nMLVDG\n" + ORTHOLOG_FASTA
+    assert (output_folder / "combined_proteins.fasta").read_text() == combined_fasta
+    assert sorted(os.listdir(output_folder)) == [
+        "ADA2_fly_orthologs.csv",
+        "combined_proteins.fasta",
+        "filtered_ADA2_fly_orthologs.csv",
+        "protein_orthologs.zip",
+    ]
+
+def test_run_ortholog_pipeline_without_checkpoints_writes_nothing(fake_upstream, tmp_path, monkeypatch):
+    input_protein_file, _ = fake_upstream
+    monkeypatch.chdir(tmp_path)
+
+    _, combined_fasta = oracle_functions.run_ortholog_pipeline(9606, 7227, 51816, input_protein_file)
+
+    assert combined_fasta.endswith(ORTHOLOG_FASTA)
+    assert os.listdir(tmp_path) == ["ADA2.txt"]
+
+def test_run_ortholog_pipeline_no_orthologs_pass_filter(fake_upstream, monkeypatch):
+    input_protein_file, fetched = fake_upstream
+    rejected = DIOPT_RESULTS.assign(best_score="No", best_score_rev="No", confidence="low")
+    monkeypatch.setattr(oracle_functions, "pull_diopt_orthologs", lambda *args: (rejected, "ADA2_fly_orthologs.csv"))
+
+    with pytest.raises(ValueError):
+        oracle_functions.run_ortholog_pipeline(9606, 7227, 51816, input_protein_file)
+    assert fetched == []
+
+#################
+#   EVOLUTION   #
+#################
+
+def test_patristic_distances_match_bio_phylo():
+    tree = oracle_functions.read_newick_trees([ADA2_TREE])[0]
+    names, distances = oracle_functions.patristic_distances(tree)
+
+    phylo_tree = Phylo.read(ADA2_TREE, "newick")
+    expected = np.array([[phylo_tree.distance(a, b) if a != b else 0.0 for b in names] for a in names])
+    np.testing.assert_allclose(distances, expected, atol=1e-9)
+
+def test_rank_orthologs_by_distance_orders_nearest_first():
+    tree = oracle_functions.read_newick_trees([ADA2_TREE])[0]
+    ranked = oracle_functions.rank_orthologs_by_distance(tree, ADA2_QUERY)
+
+    assert ranked["ortholog"].to_list() == [
+        "NP_524345.2", "NP_524130.1", "NP_996119.1", "NP_649006.2", "NP_650308.3", "NP_610977.1",
+    ]
+    assert ranked["distance"].is_monotonic_increasing
+    assert ranked["distance"].iloc[0] == pytest.approx(0.02768 + 0.31440 + 0.27960)
+
+def test_rank_orthologs_by_distance_unknown_query():
+    tree = oracle_functions.parse_newick("(A:1,B:2);")
+    with pytest.raises(ValueError):
+        oracle_functions.rank_orthologs_by_distance(tree, "C")
+
+@pytest.mark.parametrize("newick", ["A:1,B:2);", "(A:1,B:2));", "((A:1,B:2);"])
+def test_parse_newick_unbalanced_parentheses(newick):
+    with pytest.raises(ValueError):
+        oracle_functions.parse_newick(newick)
+
+def test_parse_newick_quoted_labels():
+    tree = oracle_functions.parse_newick("('Homo sapiens':1,B:2);")
+    assert tree.names.tolist() == ["", "Homo sapiens", "B"]
+    assert tree.parent.tolist() == [-1, 0, 0]
+    assert tree.branch_length.tolist() == [0.0, 1.0, 2.0]
+
+def test_collapse_zero_length_duplicates_removes_identical_isoforms():
+    tree = oracle_functions.read_newick_trees([ADA2_TREE])[0]
+    pruned, collapsed = oracle_functions.collapse_zero_length_duplicates(tree)
+
+    assert collapsed == {"NP_524130.1": ["NP_996119.1"]}
+    names, distances = oracle_functions.patristic_distances(tree)
+    pruned_names, pruned_distances = oracle_functions.patristic_distances(pruned)
+    keep = names != "NP_996119.1"
+    assert pruned_names.tolist() == names[keep].tolist()
+    np.testing.assert_allclose(pruned_distances, distances[np.ix_(keep, keep)])
+
+def test_collapse_zero_length_duplicates_only_maps_to_kept_leaves():
+    tree = oracle_functions.parse_newick("(A:0.1,B:0.0,C:0.1);")
+    pruned, collapsed = oracle_functions.collapse_zero_length_duplicates(tree, tolerance=0.1)
+
+    # C is 0.2 from A, the only kept leaf it could collapse into
+    assert collapsed == {"A": ["B"]}
+    assert oracle_functions.leaf_indices(pruned).size == 2
+    assert pruned.names[oracle_functions.leaf_indices(pruned)].tolist() == ["A", "C"]
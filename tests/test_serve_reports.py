@@ -0,0 +1,156 @@
+import os
+import sys
+import gzip
+import json
+import threading
+import http.client
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+sys.path.append(BASE_DIR)
+from oracle_scripts import serve_reports
+
+#####################
+#   BUILD REPORTS   #
+#####################
+
+def test_read_uniprot_sites_matches_domain_script():
+    sites = serve_reports.read_uniprot_sites(os.path.join(BASE_DIR, "ADA2_color_domains.pml"))
+
+    assert len(sites) == 11
+    assert sites[0] == {"type": "Active site", "start": 359, "end": 359, "color": "yellow"}
+    assert sites[5] == {"type": "Binding site", "start": 204, "end": 211, "color": "blue"}
+    assert [site["type"] for site in sites].count("Active site") == 2
+
+def test_read_uniprot_sites_rejects_unselected_site(tmp_path):
+    script = tmp_path / "color_domains.pml"
+    script.write_text("from pymol import cmd\ncmd.color('yellow', 'site_0')\n")
+    with pytest.raises(ValueError):
+        serve_reports.read_uniprot_sites(str(script))
+
+def make_gene_outputs(base_dir, gene_symbol="ADA2"):
+    output_folder = base_dir / f"{gene_symbol}_ortholog_and_alignments_output"
+    output_folder.mkdir()
+    (output_folder / f"filtered_{gene_symbol}_fly_orthologs.csv").write_text("entrez_id,symbol\n39975,Adgf-B\n")
+    (base_dir / f"{gene_symbol}_mapped_alleles.csv").write_text(
+        "protein_change,significance_description,amino_acid_position,color\n"
+        "G47R,Pathogenic,47,red\n"
+        "A53T,Benign,53,green\n"
+    )
+
+def test_build_report_reads_mapped_alleles(tmp_path):
+    make_gene_outputs(tmp_path)
+    report, tree_png = serve_reports.build_report("ADA2", 51816, "Q9NZK5", str(tmp_path))
+
+    assert report["orthologs"] == [{"entrez_id": "39975", "symbol": "Adgf-B"}]
+    assert report["alleles"][0] == {
+        "protein_change": "G47R",
+        "significance_description": "Pathogenic",
+        "amino_acid_position": "47",
+        "color": "red",
+    }
+    assert report["uniprot_sites"] == []
+    assert tree_png is None
+
+def test_build_report_missing_output_folder(tmp_path):
+    make_gene_outputs(tmp_path)
+    with pytest.raises(FileNotFoundError):
+        serve_reports.build_report("ada2", 51816, "Q9NZK5", str(tmp_path))
+
+def test_store_report_refuses_symbol_differing_in_case(tmp_path):
+    db_path = str(tmp_path / "reports.db")
+    serve_reports.store_report(db_path, {"symbol": "ADA2", "entrez_id": "51816", "uniprot_id": "Q9NZK5"})
+    with pytest.raises(ValueError):
+        serve_reports.store_report(db_path, {"symbol": "ada2", "entrez_id": "51816", "uniprot_id": "Q9NZK5"})
+
+#####################
+#   SERVE REPORTS   #
+#####################
+
+def test_etag_matches():
+    etag = 'W/"abc"'
+    assert serve_reports.etag_matches('W/"abc"', etag)
+    assert serve_reports.etag_matches('"abc"', etag)
+    assert serve_reports.etag_matches('"xyz", W/"abc"', etag)
+    assert serve_reports.etag_matches("*", etag)
+    assert not serve_reports.etag_matches('"ab"', etag)
+    assert not serve_reports.etag_matches("", etag)
+
+def test_accepts_gzip():
+    assert serve_reports.accepts_gzip("gzip, deflate")
+    assert serve_reports.accepts_gzip("deflate, gzip;q=0.5")
+    assert serve_reports.accepts_gzip("*")
+    assert not serve_reports.accepts_gzip("gzip;q=0")
+    assert not serve_reports.accepts_gzip("*, gzip;q=0")
+    assert not serve_reports.accepts_gzip("identity")
+    assert not serve_reports.accepts_gzip("")
+
+@pytest.fixture
+def report_server(tmp_path):
+    db_path = str(tmp_path / "reports.db")
+    report = {"symbol": "ADA2", "entrez_id": "51816", "uniprot_id": "Q9NZK5", "orthologs": []}
+    serve_reports.store_report(db_path, report, b"\x89PNG fake")
+
+    store = serve_reports.ReportStore(db_path)
+    handler = type("Handler", (serve_reports.ReportRequestHandler,), {"store": store, "log_message": lambda *args: None})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, db_path, report
+    server.shutdown()
+    server.server_close()
+
+def request(server, method, path, headers=None):
+    conn = http.client.HTTPConnection(*server.server_address)
+    conn.request(method, path, headers=headers or {})
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, body
+
+def test_server_gzip_and_identity(report_server):
+    server, _, report = report_server
+
+    response, body = request(server, "GET", "/genes/uniprot/q9nzk5", {"Accept-Encoding": "gzip"})
+    assert response.status == 200
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert json.loads(gzip.decompress(body)) == report
+
+    response, body = request(server, "GET", "/genes/entrez/51816", {"Accept-Encoding": "gzip;q=0"})
+    assert response.status == 200
+    assert response.getheader("Content-Encoding") is None
+    assert json.loads(body) == report
+    assert response.getheader("ETag").startswith("W/")
+
+def test_server_not_modified_and_head(report_server):
+    server, _, _ = report_server
+
+    response, _ = request(server, "GET", "/genes/symbol/ADA2")
+    etag = response.getheader("ETag")
+    response, body = request(server, "GET", "/genes/symbol/ADA2", {"If-None-Match": f'"other", {etag}'})
+    assert response.status == 304
+    assert body == b""
+
+    response, body = request(server, "HEAD", "/genes/symbol/ADA2/tree.png")
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "image/png"
+    assert int(response.getheader("Content-Length")) == len(b"\x89PNG fake")
+    assert body == b""
+
+    response, _ = request(server, "GET", "/genes/symbol/PDGFB")
+    assert response.status == 404
+
+def test_server_serves_rebuilt_report(report_server):
+    server, db_path, report = report_server
+
+    response, _ = request(server, "GET", "/genes/symbol/ADA2")
+    old_etag = response.getheader("ETag")
+
+    rebuilt = dict(report, orthologs=[{"entrez_id": "39975", "symbol": "Adgf-B"}])
+    serve_reports.store_report(db_path, rebuilt)
+
+    response, body = request(server, "GET", "/genes/symbol/ADA2", {"If-None-Match": old_etag})
+    assert response.status == 200
+    assert json.loads(body) == rebuilt